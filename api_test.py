@@ -1,42 +1,50 @@
-from fastapi import FastAPI
-from datetime import datetime 
+from fastapi import FastAPI, Response
+import orjson
+import time
 
 app = FastAPI()
 
+# These responses never change, so they are encoded once here and every request just sends the bytes
+_HELLO_BYTES = orjson.dumps({"message": "Hello Disa"})
+
+_SKILLS_BYTES = orjson.dumps({
+    "python":"learning",
+    "apis": "starting",
+    "goal": "full developer"
+})
+
+_PROGRESS_BYTES = orjson.dumps({
+    "days_learning": 1,
+    "current_topic": "FastAPI",
+    "completed_topic": [
+        "Python basics",
+        "Functions",
+        "Web basics"
+    ],
+    "next_topics": [
+        "Database",
+        "Authentication",
+        "Docker"
+    ]
+})
+
+# Only the timestamp in /status changes, everything around it is encoded once
+_STATUS_PREFIX = b'{"user":"Disa","status":"Learning APIs","timestamp":"'
+_STATUS_SUFFIX = b'","active_endpoints":' + orjson.dumps(["/", "/skills", "/progress", "/status"]) + b'}'
+
 @app.get("/")
 def hello_disa():
-    return {"message": "Hello Disa"}
+    return Response(content=_HELLO_BYTES, media_type="application/json")
 
 @app.get("/skills")
 def my_skills():
-    return{
-        "python":"learning",
-        "apis": "starting",
-        "goal": "full developer"
-    }
+    return Response(content=_SKILLS_BYTES, media_type="application/json")
 
 @app.get("/progress")
 def learning_progress():
-    return{
-        "days_learning": 1,
-        "current_topic": "FastAPI",
-        "completed_topic": [
-            "Python basics",
-            "Functions",
-            "Web basics"
-        ],
-        "next_topics": [
-            "Database",
-            "Authentication",
-            "Docker"
-        ]
-    }
+    return Response(content=_PROGRESS_BYTES, media_type="application/json")
 
 @app.get("/status")
 def check_status():
-    return{
-        "user": "Disa",
-        "status": "Learning APIs",
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "active_endpoints": ["/", "/skills", "/progress", "/status"]
-    }
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S").encode()
+    return Response(content=_STATUS_PREFIX + timestamp + _STATUS_SUFFIX, media_type="application/json")
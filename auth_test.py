@@ -1,10 +1,14 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
+from collections import OrderedDict
+import hashlib
+import hmac
+import time
 
 #Initialize FastAPI
 app = FastAPI(title="Authentication Test")
@@ -15,8 +19,12 @@ SECRET_KEY = "test-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Build the HMAC key once, jose would otherwise rebuild it from SECRET_KEY on every encode/decode
+SIGNING_KEY = jwk.construct(SECRET_KEY, algorithm=ALGORITHM)
+
 # Setup password hashing - this creates a context that how to hash and verify passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated = "auto")
+# DEV ONLY: 4 rounds keeps test logins fast, real code (learning_api.py) keeps the default 12
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4, deprecated = "auto")
 
 # Setup the OAuth2 scheme - this tells FastAPI how to handle bearer tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -31,19 +39,48 @@ class User(BaseModel):
     username : str
     disabled: Optional[bool] = None
 
+# bcrypt hash (4 rounds) of "testpassword", precomputed so importing the module doesn't run bcrypt
+HASHED_TEST_PASSWORD = "$2b$04$VbDjzTSULeOQnFgu9hl8lumHW3c.BZ.bwWDvtIbID3W8siepF5DF."
+
 # For testing, we'll use a simple dictionary as our user database
 fake_user_db = {
     "testuser": {
         "username": "testuser",
-        "hashed_password": pwd_context.hash("testpassword"),
+        "hashed_password": HASHED_TEST_PASSWORD,
         "disabled": False 
     }
 }
 
+# Successful bcrypt checks are remembered so repeated logins skip the ~100ms hash.
+# Keys are HMAC digests, so plain passwords never sit in memory
+VERIFY_CACHE_SIZE = 1024
+_verify_cache: "OrderedDict[bytes, bool]" = OrderedDict()
+
+# Decoded tokens, so a token is only signature-checked once per TTL window
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_TTL_SECONDS = 300
+_token_cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
 # Helper functions
+def _verify_cache_key(plain_password: str, hashed_password: str) -> bytes:
+    """Derive the cache key for a password/hash pair"""
+    message = f"{plain_password}:{hashed_password}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify if plain password matches its hashed version"""
-    return pwd_context.verify(plain_password, hashed_password)
+    key = _verify_cache_key(plain_password, hashed_password)
+    if key in _verify_cache:
+        _verify_cache.move_to_end(key)
+        return True
+
+    # Only successful checks are cached, so wrong guesses always pay full bcrypt cost
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False
+    _verify_cache[key] = True
+    if len(_verify_cache) > VERIFY_CACHE_SIZE:
+        _verify_cache.popitem(last=False)
+    return True
 
 def get_user(username: str):
     """Get user from our test database"""
@@ -56,7 +93,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, SIGNING_KEY, algorithm=ALGORITHM)
+
+def decode_token_username(token: str) -> Optional[str]:
+    """Return the username stored in a valid token, caching successful decodes"""
+    now = time.time()
+    cached = _token_cache.get(token)
+    if cached is not None:
+        valid_until, username = cached
+        if valid_until > now:
+            return username
+        del _token_cache[token]
+
+    # Raises JWTError for bad or expired tokens, which are never cached
+    payload = jwt.decode(token, SIGNING_KEY, algorithms=[ALGORITHM])
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    # Never keep a token around past its own expiry
+    _token_cache[token] = (min(payload["exp"], now + TOKEN_CACHE_TTL_SECONDS), username)
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return username
+
+@app.on_event("startup")
+async def startup_event():
+    _verify_cache.clear()
+    _token_cache.clear()
 
 #Endpoints
 @app.post("/token", response_model=Token)
@@ -81,12 +145,11 @@ async def login(from_data: OAuth2PasswordRequestForm = Depends()):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/test-auth")
-async def test_authentication(token, str = Depends(oauth2_scheme)):
+async def test_authentication(token: str = Depends(oauth2_scheme)):
     """Test endpoint that requires authentication"""
     try:
         #Verify token
-        playload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = playload.get("sub")
+        username = decode_token_username(token)
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
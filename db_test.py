@@ -2,10 +2,10 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from enum import Enum
-from datetime import datetime
+import time
 import sqlite3
 from contextlib import contextmanager
-import json
+import orjson
 
 app = FastAPI(title="Database Integretion Test")
 
@@ -18,7 +18,7 @@ class LearningTopic(str, Enum):
     AI = "AI"
     DJANGO = "Django"
 
-class LearningUpdate:
+class LearningUpdate(BaseModel):
     topic: LearningTopic
     hours_spent: float = Field(gt=0, lt=24)
     difficulty_level: int = Field(ge=1, le=5)
@@ -47,7 +47,7 @@ def init_db():
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            CREATE A TABLE IF NOT EXIST learning_updates (
+            CREATE TABLE IF NOT EXISTS learning_updates (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 topic TEXT NOT NULL,
                 hours_spent REAL NOT NULL,
@@ -74,30 +74,38 @@ async def add_learning_progress(update: LearningUpdate):
         with get_db_connection() as conn:
             cursor = conn.cursor()
 
-        # SQLite doesn't have a native JSON type, so we convert lists to JSON string
-        questions_json = json.dumps(update.question)
+            # SQLite doesn't have a native JSON type, so we convert lists to JSON string
+            questions_json = orjson.dumps(update.question).decode()
 
-        cursor.execute('''
-            INSERT INTO learning_updates
-            ( topic, hours_spent, difficulty_level, notes, understanding_level, timestamp) 
-            VALUES (?, ?, ?, ?, ?, ?,)
-            RETURNING id
-        ''', (
-            update.topic,
-            update.hours_spent,
-            update.difficulty_level,
-            update.notes,
-            update.understanding_level,
-            questions_json,
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        ))
-        # Get the ID of the newly inserted row
-        new_id = cursor.fetchone()[0]
-        conn.commit()
+            cursor.execute('''
+                INSERT INTO learning_updates
+                ( topic, hours_spent, difficulty_level, notes, understanding_level, questions, timestamp) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                RETURNING id
+            ''', (
+                update.topic,
+                update.hours_spent,
+                update.difficulty_level,
+                update.notes,
+                update.understanding_level,
+                questions_json,
+                time.strftime("%Y-%m-%d %H:%M:%S")
+            ))
+            # Get the ID of the newly inserted row
+            new_id = cursor.fetchone()[0]
+            conn.commit()
 
         return {
             "message": "Progress updated successfully!",
-            "data": {**update.model_dupm(), "id": new_id}
+            "data": {
+                "topic": update.topic,
+                "hours_spent": update.hours_spent,
+                "difficulty_level": update.difficulty_level,
+                "notes": update.notes,
+                "understanding_level": update.understanding_level,
+                "questions": update.question,
+                "id": new_id
+            }
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -105,7 +113,7 @@ async def add_learning_progress(update: LearningUpdate):
 @app.get("/view-progress")
 async def view_progress():
     """Retrieve all learning progress entries"""
-    with get_db_connection as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM learning_updates')
         rows = cursor.fetchall()
@@ -120,7 +128,7 @@ async def view_progress():
                 "difficulty_level": row[3],
                 "notes": row[4],
                 "understanding_level": row[5],
-                "questions": json.loads(row[6]) if row[6] else [],
+                "questions": orjson.loads(row[6]) if row[6] else [],
                 "timestamp": row[7]
             }
             entries.append(entry)
@@ -1,25 +1,42 @@
 # 1 Imports
-from fastapi import FastAPI, HTTPException, Depends, status 
+from fastapi import FastAPI, HTTPException, Depends, Body, Query, Request, Response, status 
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwk, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional,Dict, Any, Union
 from enum import Enum
+from collections import OrderedDict
 import sqlite3 # This is our databese engine
-from contextlib import contextmanager
-import json # We will need this to handle lists in SQLite
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import orjson # We will need this to handle lists in SQLite (much faster than stdlib json)
 from sqlite3 import IntegrityError
 
+logger = logging.getLogger(__name__)
+
 # Security configurations
 
 SECRET_KEY = "your-secret-key-keep-it-safe" # In production, this should be seciue
 ALGORITHM = "HS256" # The algorithm used to sign in the JWB tokens
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 # How long tokens remains active
+SIGNING_KEY = jwk.construct(SECRET_KEY, algorithm=ALGORITHM) # Built once instead of on every encode/decode
 
 # Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto") # This handles password hashing
+# bcrypt cost for new hashes. Keep the default 12 in production, BCRYPT_ROUNDS=4 makes local dev and tests fast
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=BCRYPT_ROUNDS, deprecated="auto") # This handles password hashing
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token") # This handles token authentication 
 
 # For demostration, we'll use a simple dictionary as our user dabase
@@ -47,37 +64,71 @@ class UserInDB(User):
     """User model as stored in database, including hashed password"""
     hashed_password: str
 
+# bcrypt hash of "testpassword123", precomputed so importing the module doesn't run bcrypt
+HASHED_TEST_PASSWORD = "$2b$12$8zuVwOtZkFwcXUkCVArqP.xRszL4c9N.hzFx2onlq8Alx/.WLpyNi"
+
 # Test user database (in production, this would be a real database)
 fake_users_db = {
     "denis": {
         "username": "denis",
         "full_name": "Denis Developer",
         "email": "denis@example.com",
-        "hashed_password": pwd_context.hash("testpassword123"),
+        "hashed_password": HASHED_TEST_PASSWORD,
         "disabled": False 
     }
 }
 
+# Successful password checks, so a repeat login skips bcrypt for a short while.
+# Keys are HMACs, the plain password is never stored. A changed password has a new hash, so it never hits an old entry
+VERIFY_CACHE_SIZE = 1024
+VERIFY_CACHE_TTL_SECONDS = 60
+_verify_cache: "OrderedDict[bytes, float]" = OrderedDict() # key -> expiry (time.monotonic)
+_verify_cache_lock = threading.Lock() # /token runs in the threadpool, so several threads share the cache
+
 # Authentication helper functions
+def _verify_cache_key(plain_password: str, hashed_password: str) -> bytes:
+    """Derive the cache key for a password/hash pair"""
+    message = f"{plain_password}:{hashed_password}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify if a plain password matches its hashed version"""
-    return pwd_context.verify(plain_password, hashed_password)
+    key = _verify_cache_key(plain_password, hashed_password)
+    now = time.monotonic()
+    with _verify_cache_lock:
+        expires = _verify_cache.get(key)
+        if expires is not None and expires > now:
+            _verify_cache.move_to_end(key)
+            return True
+
+    # Only successful checks are cached, so wrong guesses always pay full bcrypt cost
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False
+    with _verify_cache_lock:
+        _verify_cache[key] = now + VERIFY_CACHE_TTL_SECONDS
+        _verify_cache.move_to_end(key)
+        if len(_verify_cache) > VERIFY_CACHE_SIZE:
+            _verify_cache.popitem(last=False)
+    return True
 
 def get_user(username: str) -> Optional[UserInDB]:
     """Retrive a user from the database"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        if user:
-            return UserInDB(
-                username = user[1],
-                email = user[2],
-                full_name = user[3],
-                hashed_password = user[4],
-                disabled = user[5]
-            )
-    return None
+    try:
+        with get_db_connection() as conn:
+            user = conn.execute(SQL_SELECT_USER, (username,)).fetchone()
+            
+            if user:
+                return UserInDB(
+                    username=user["username"],
+                    email=user["email"], 
+                    full_name=user["full_name"],
+                    hashed_password=user["hashed_password"],
+                    disabled=bool(user["disabled"]) if user["disabled"] is not None else None
+                )
+            return None
+    except Exception:
+        logger.exception("Could not load user %s", username)
+        return None
 
 
 def authenticate_user(username: str, password: str) -> Union[bool, UserInDB]:
@@ -95,7 +146,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, SIGNING_KEY, algorithm=ALGORITHM)
+
+# Tokens we already checked, so repeat requests skip jwt.decode and the user lookup.
+# Valid tokens are kept until they expire or for TOKEN_CACHE_TTL_SECONDS, whichever is sooner.
+# Rejected tokens are kept (as None) for a few seconds so a client retrying a bad token doesn't keep decoding it.
+# Only the event loop touches this (get_current_user is async), so it needs no lock
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_TTL_SECONDS = 30
+INVALID_TOKEN_CACHE_TTL_SECONDS = 5
+_token_cache: "OrderedDict[str, tuple[float, Optional[UserInDB]]]" = OrderedDict()
+
+def _cache_token(token: str, expires: float, user: Optional[UserInDB]):
+    _token_cache[token] = (expires, user)
+    _token_cache.move_to_end(token)
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     """Validate token and return current user"""
@@ -104,22 +170,49 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         detail = "Could not validate credential",
         headers = {"WWW-Authenticate": "Bearer"},
     )
+    now = time.time()
+    cached = _token_cache.get(token)
+    if cached is not None:
+        expires, user = cached
+        if expires > now:
+            _token_cache.move_to_end(token)
+            if user is None:
+                raise credentials_exception
+            return user
+        del _token_cache[token]
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SIGNING_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
-    except JWTError:
+    except (JWTError, HTTPException):
+        _cache_token(token, now + INVALID_TOKEN_CACHE_TTL_SECONDS, None)
         raise credentials_exception
     
-    user = get_user(username=token_data.username)
+    # get_user is a blocking SQLite query, run it in the threadpool so the event loop keeps serving
+    user = await run_in_threadpool(get_user, token_data.username)
     if user is None:
+        _cache_token(token, now + INVALID_TOKEN_CACHE_TTL_SECONDS, None)
         raise credentials_exception
+    _cache_token(token, min(payload["exp"], now + TOKEN_CACHE_TTL_SECONDS), user)
     return user
 
 
 # 2 App initialization 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up the database once per worker, and release the connections on shutdown"""
+    init_db()
+    prewarm_pool()
+    yield
+    # Refresh the query planner statistics, cheap and only does work when tables changed enough to matter
+    with get_db_connection() as conn:
+        conn.execute('PRAGMA optimize')
+    close_pool()
+    await asyncio.wrap_future(_writer.submit(_close_writer_connection))
+
 app = FastAPI(
     title= "Learning Progress Tracker",
     description="""
@@ -134,6 +227,8 @@ app = FastAPI(
     This API is a part of learning journey to become a professional Python developer.
     """,
     version = "1.0.0",
+    default_response_class = ORJSONResponse,
+    lifespan = lifespan,
     openapi_tags = [{
         "name": "Learning Progress",
         "description": "Operations for tracking and learning sessions"     
@@ -141,11 +236,22 @@ app = FastAPI(
 )
 
 
+# Database errors that reach FastAPI are turned into responses here, so endpoints don't need their own try/except
+@app.exception_handler(sqlite3.IntegrityError)
+async def integrity_error_handler(request: Request, exc: sqlite3.IntegrityError):
+    return ORJSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(sqlite3.OperationalError)
+async def operational_error_handler(request: Request, exc: sqlite3.OperationalError):
+    return ORJSONResponse(status_code=500, content={"detail": str(exc)})
+
+
 # Login endpoint
 @app.post("/token", response_model = Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Endpoint for user authentication and token generation"""
-    user = authenticate_user(form_data.username, form_data.password )
+    # bcrypt takes ~100ms of CPU, in the threadpool it doesn't stall every other request on the loop
+    user = await run_in_threadpool(authenticate_user, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code = status.HTTP_401_UNAUTHORIZED,
@@ -162,37 +268,213 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 @app.post("/register", response_model=User)
 async def register_user(username:str, password: str, email: Optional[str] = None, full_name: Optional[str] = None ):
     """Register a new user"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            hashed_password = pwd_context.hash(password)
-            cursor.execute('''
-                INSERT INTO users (username, email, full_name, hashed_password)
-                VALUES (?, ?, ?, ?)
-                RETURNING id, username, email, full_name
-            ''', (username, email, full_name, hashed_password))
-            user_data = cursor.fetchone()
-            conn.commit()
-            return {
-                "username": user_data[1],
-                "email": user_data[2],
-                "full_name": user_data[3]
-            }
-        except IntegrityError:
-            raise HTTPException(
-                status_code = 400,
-                detail = "Username already exists"
-            )
+    def insert_user(conn, hashed_password):
+        user_data = conn.execute('''
+            INSERT INTO users (username, email, full_name, hashed_password)
+            VALUES (?, ?, ?, ?)
+            RETURNING id, username, email, full_name
+        ''', (username, email, full_name, hashed_password)).fetchone()
+        conn.commit()
+        return user_data
+
+    # Hash in the threadpool, bcrypt is slow and would hold up every other write on the writer thread
+    hashed_password = await run_in_threadpool(pwd_context.hash, password)
+    try:
+        user_data = await run_write(insert_user, hashed_password)
+        return {
+            "username": user_data["username"],
+            "email": user_data["email"],
+            "full_name": user_data["full_name"]
+        }
+    except IntegrityError:
+        raise HTTPException(
+            status_code = 400,
+            detail = "Username already exists"
+        )
 
 # 3 Database connection manager
 
+DB_PATH = 'learning_progress.db'
+DB_POOL_SIZE = 8 # How many idle connections we keep open between requests
+
+# Reusing connections keeps SQLite's page cache warm instead of reopening the file per request
+_POOL: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=DB_POOL_SIZE)
+
+def _connect() -> sqlite3.Connection:
+    """Open a new connection with our per-connection settings"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row # Rows can be read by column name as well as by index
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-64000') # 64 MB page cache
+    conn.execute('PRAGMA mmap_size=268435456') # Map up to 256 MB of the file, scans read straight from the OS page cache
+    return conn
+
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect('learning_progress.db')
+    try:
+        conn = _POOL.get_nowait()
+    except queue.Empty:
+        conn = _connect()
     try:
         yield conn
     finally:
-        conn.close()
+        # Never hand a connection with an unfinished transaction to the next request
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _POOL.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def prewarm_pool():
+    """Fill the pool up front so the first requests don't all wait on sqlite3.connect"""
+    while not _POOL.full():
+        _POOL.put_nowait(_connect())
+
+def close_pool():
+    """Close every idle pooled connection"""
+    while True:
+        try:
+            _POOL.get_nowait().close()
+        except queue.Empty:
+            break
+
+# SQLite only allows one writer at a time, so every write runs on this one thread with its own connection.
+# Writers then queue up here instead of holding threadpool threads while they wait for the write lock
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+_writer_conn: Optional[sqlite3.Connection] = None
+
+def _run_on_writer(func, *args):
+    """Call func(conn, *args) with the writer connection (runs on the writer thread)"""
+    global _writer_conn
+    if _writer_conn is None:
+        _writer_conn = _connect()
+    try:
+        return func(_writer_conn, *args)
+    finally:
+        if _writer_conn.in_transaction:
+            _writer_conn.rollback()
+
+def _close_writer_connection():
+    global _writer_conn
+    if _writer_conn is not None:
+        _writer_conn.close()
+        _writer_conn = None
+
+async def run_write(func, *args):
+    """Run a write function on the writer thread without blocking the event loop"""
+    return await asyncio.wrap_future(_writer.submit(_run_on_writer, func, *args))
+
+# Encoded bodies of read endpoints, all built at one data_version (see init_db). That version comes from the
+# database, so writes from any worker or process move it, and the first body stored at a new version drops
+# everything older. Nothing is served stale and no TTL is needed. Capped by size, since /view-progress pages
+# can hold up to 500 entries of free-text notes. The read endpoints run in the threadpool, hence the lock
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+_response_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_response_cache_version: Optional[int] = None
+_response_cache_bytes = 0
+_response_cache_lock = threading.Lock()
+
+def get_cached_response(version: int, key: tuple) -> Optional[bytes]:
+    """Return the body cached for key at this data version, or None"""
+    with _response_cache_lock:
+        if version != _response_cache_version:
+            return None
+        body = _response_cache.get(key)
+        if body is not None:
+            _response_cache.move_to_end(key)
+        return body
+
+def cache_response(version: int, key: tuple, body: bytes):
+    global _response_cache_version, _response_cache_bytes
+    with _response_cache_lock:
+        if version != _response_cache_version:
+            _response_cache.clear()
+            _response_cache_bytes = 0
+            _response_cache_version = version
+        if len(body) > RESPONSE_CACHE_MAX_BYTES:
+            return
+        previous = _response_cache.pop(key, None)
+        if previous is not None:
+            _response_cache_bytes -= len(previous)
+        _response_cache[key] = body
+        _response_cache_bytes += len(body)
+        while _response_cache_bytes > RESPONSE_CACHE_MAX_BYTES:
+            _response_cache_bytes -= len(_response_cache.popitem(last=False)[1])
+
+# SQL used by the endpoints. Keeping each statement in one constant means every caller sends the exact same
+# text, so sqlite3's statement cache hits instead of compiling near-identical copies
+SQL_SELECT_USER = 'SELECT id, username, email, full_name, hashed_password, disabled FROM users WHERE username = ?'
+SQL_SELECT_USER_ID = 'SELECT id FROM users WHERE username = ?'
+SQL_SELECT_DATA_VERSION = 'SELECT version FROM data_version'
+SQL_INSERT_ENTRY = '''
+    INSERT INTO learning_updates
+    (user_id, topic, hours_spent, difficulty_level, notes, understanding_level, questions, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_INSERT_ENTRY_RETURNING_ID = SQL_INSERT_ENTRY + 'RETURNING id'
+# SQLite builds the whole entries array for one page, so Python never touches the individual rows.
+# The aggregate reads the page in the subquery's id order. questions is already JSON, json() embeds it as-is.
+# The user's totals come from the same statement, so they always match the page even with a write in between.
+# Both totals come from one pass in the derived table t (two scalar subqueries would scan twice)
+SQL_SELECT_USER_PAGE_JSON = '''
+    SELECT t.total_entries, t.total_hours, p.page_size, p.last_id, p.entries
+    FROM (
+        SELECT COUNT(*) AS total_entries, COALESCE(SUM(hours_spent), 0.0) AS total_hours
+        FROM learning_updates
+        WHERE user_id = ?1
+    ) AS t, (
+        SELECT COUNT(*) AS page_size, MAX(id) AS last_id, json_group_array(json_object(
+            'id', id,
+            'topic', topic,
+            'hours_spent', round(hours_spent, 6), -- HOURS_DECIMALS, see _row_to_dict
+            'difficulty_level', difficulty_level,
+            'notes', notes,
+            'understanding_level', understanding_level,
+            'questions', json(COALESCE(questions, '[]')),
+            'timestamp', timestamp
+        )) AS entries
+        FROM (
+            SELECT id, topic, hours_spent, difficulty_level, notes, understanding_level, questions, timestamp
+            FROM learning_updates
+            WHERE user_id = ?1 AND id > ?2
+            ORDER BY id
+            LIMIT ?3
+        )
+    ) AS p
+'''
+SQL_SELECT_RECENT_BY_TOPIC = '''
+    SELECT id, topic, hours_spent, difficulty_level, notes, understanding_level, questions, timestamp
+    FROM learning_updates
+    WHERE topic = ?
+    ORDER BY timestamp DESC
+    LIMIT 5
+'''
+# One UPDATE for every PUT: a NULL parameter keeps the current value. questions can legitimately be set to NULL
+# (no questions), so it takes a flag saying whether it was sent.
+# The CAST is needed because RETURNING hands back whole REAL values like 3.0 as integers
+SQL_UPDATE_ENTRY = '''
+    UPDATE learning_updates SET
+        topic = COALESCE(?, topic),
+        hours_spent = COALESCE(?, hours_spent),
+        difficulty_level = COALESCE(?, difficulty_level),
+        notes = COALESCE(?, notes),
+        understanding_level = COALESCE(?, understanding_level),
+        questions = CASE WHEN ? THEN ? ELSE questions END
+    WHERE id = ? AND user_id = (SELECT id FROM users WHERE username = ?)
+    RETURNING id, topic, CAST(hours_spent AS REAL) AS hours_spent, difficulty_level, notes, understanding_level, questions, timestamp
+'''
+SQL_DELETE_BY_ID = 'DELETE FROM learning_updates WHERE id = ? RETURNING id'
+# One row per topic, most hours first (topic breaks ties so the order is always the same).
+# The window columns repeat the overall totals on every row, so no separate totals row or query is needed
+SQL_SUMMARY = '''
+    SELECT topic, SUM(hours_spent) AS hours, COUNT(*) AS sessions, AVG(understanding_level) AS avg_understanding,
+        SUM(SUM(hours_spent)) OVER () AS total_hours, SUM(COUNT(*)) OVER () AS total_entries
+    FROM learning_updates
+    GROUP BY topic
+    ORDER BY hours DESC, topic
+'''
 
 
 # 4 MODELS
@@ -207,6 +489,8 @@ class LearningTopic(str, Enum):
 
 #Enhance data validation ( улучшенная валидация данных)
 class LearningUpdate(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     topic: LearningTopic #No only acctepts prefered topic
     hours_spent: float = Field(gt=0, lt=24) # Must be between 0 and 24
     difficulty_level: int = Field(ge=1, le=5) # Must be between 1 and 5
@@ -224,33 +508,44 @@ class LearningUpdatePatch(BaseModel):
 
 # 5 Initialize database
 
-def init_db():
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS learning_updates(
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            user_id INTEGER NOT NULL,
-                            topic TEXT NOT NULL, 
-                            hours_spent REAL NOT NULL,
-                            difficulty_level INTEGER NOT NULL,
-                            notes TEXT NOT NULL,
-                            understanding_level INTEGER NOT NULL,
-                            questions TEXT,
-                            timestamp TEXT NOT NULL,
-                            FOREIGN KEY (user_id) REFERENCES user(id)
-                       )
-                ''')
-        conn.commit()
-
-# Call init.db at startup
-init_db()
+# Bump this whenever the schema below changes, databases already at this version skip the DDL on startup
+SCHEMA_VERSION = 3
+# What a version means: these columns exist. CREATE TABLE IF NOT EXISTS leaves older tables as they were,
+# so constraints like the json_valid CHECK are only there on databases this script created,
+# later migrations must not count on them
+SCHEMA_COLUMNS = {
+    'users': {'id', 'username', 'email', 'full_name', 'hashed_password', 'disabled', 'created_at'},
+    'learning_updates': {'id', 'user_id', 'topic', 'hours_spent', 'difficulty_level', 'notes',
+                         'understanding_level', 'questions', 'timestamp'},
+    'data_version': {'id', 'version'},
+}
 
-# User tabled 
-def init_user_db():
+def init_db():
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
+        user_version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if user_version >= SCHEMA_VERSION:
+            return
+        # CREATE TABLE IF NOT EXISTS leaves a table from an older file as it is, so check what is already there
+        # first. The script below would fail halfway on it (the indexes need the new columns)
+        missing = {}
+        for table, columns in SCHEMA_COLUMNS.items():
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if existing and columns - existing:
+                missing[table] = sorted(columns - existing)
+        if missing:
+            raise RuntimeError(
+                f"Database {DB_PATH} (user_version {user_version}) has tables from an older schema, missing columns "
+                f"{missing}. Migrate it or start with a new database file"
+            )
+        # One executescript call runs the whole setup. The DDL is one transaction, so a failure part way
+        # rolls it all back (get_db_connection rolls back unfinished transactions) instead of leaving half a schema
+        conn.executescript(f'''
+            -- page_size only applies to a brand new database file (an existing one needs VACUUM), so set it first
+            PRAGMA page_size=4096;
+            -- WAL is stored in the database file, so setting it once here covers every connection.
+            -- Neither PRAGMA can run inside a transaction
+            PRAGMA journal_mode=WAL;
+            BEGIN;
             CREATE TABLE IF NOT EXISTS users(
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,           
@@ -259,28 +554,81 @@ def init_user_db():
                 hashed_password TEXT NOT NULL,
                 disabled BOOLEAN DEFAULT FALSE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )     
+            );
+            CREATE TABLE IF NOT EXISTS learning_updates(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                topic TEXT NOT NULL, 
+                hours_spent REAL NOT NULL,
+                difficulty_level INTEGER NOT NULL,
+                notes TEXT NOT NULL,
+                understanding_level INTEGER NOT NULL,
+                questions TEXT CHECK (questions IS NULL OR json_valid(questions)),
+                timestamp TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            );
+            -- by-topic filters on topic and orders by timestamp, so one index covers both
+            CREATE INDEX IF NOT EXISTS idx_lu_topic_ts ON learning_updates(topic, timestamp);
+            -- /view-progress reads one user's rows, the index also keeps them in id (rowid) order for the keyset page
+            CREATE INDEX IF NOT EXISTS idx_lu_user ON learning_updates(user_id);
+            -- One row, bumped by the triggers below on every change to learning_updates, whoever makes it
+            -- (another worker, the sqlite3 CLI, a script). The response caches and the /view-progress ETag key on it.
+            -- Seeded with the clock in milliseconds so a recreated file doesn't hand out old values again
+            CREATE TABLE IF NOT EXISTS data_version(
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO data_version VALUES (1, CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER));
+            CREATE TRIGGER IF NOT EXISTS lu_version_insert AFTER INSERT ON learning_updates
+                BEGIN UPDATE data_version SET version = version + 1; END;
+            CREATE TRIGGER IF NOT EXISTS lu_version_update AFTER UPDATE ON learning_updates
+                BEGIN UPDATE data_version SET version = version + 1; END;
+            CREATE TRIGGER IF NOT EXISTS lu_version_delete AFTER DELETE ON learning_updates
+                BEGIN UPDATE data_version SET version = version + 1; END;
+            PRAGMA user_version={SCHEMA_VERSION};
+            COMMIT;
         ''')
-        conn.commit()
+
+def _questions_to_db(questions: Optional[List[str]]) -> Optional[str]:
+    """Encode questions for the questions column, no questions are stored as NULL instead of '[]'"""
+    return orjson.dumps(questions).decode() if questions else None
+
+# hours_spent is rounded when it is read, here and in SQL_SELECT_USER_PAGE_JSON. SQLite's json_object prints
+# 15 significant digits and orjson the shortest exact form, with 6 decimals both print the same number
+HOURS_DECIMALS = 6
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    """Turn a learning_updates row into a response entry, column names become the keys"""
+    entry = dict(row)
+    entry["hours_spent"] = round(entry["hours_spent"], HOURS_DECIMALS)
+    entry["questions"] = orjson.loads(entry["questions"]) if entry["questions"] else []
+    return entry
 
 # 6 ENDPOINTS Update POST endpoint to use database
-@app.on_event("startup")
-async def startup_event():
-    init_db()
-    init_user_db()
 
 
 
 
 @app.get("/view-progress", tags=["Learning Progress"])
-def view_all_progress(current_user: User = Depends(get_current_user)) -> Dict[str, Any]:
+def view_all_progress(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    after: int = Query(0, ge=0, le=2**63 - 1), # SQLite integers are 64-bit, anything bigger fails to bind (a 500)
+    current_user: User = Depends(get_current_user)
+) -> Response:
     """
-    Retrive all learning progress entries
+    Retrive learning progress entries, one page at a time
 
     Returns a comprehensive view of all learning sessions, including:
     - Total number of entries
     - Total hours spent learning
-    -Detailed list of all learning sessions
+    -Detailed list of the learning sessions on this page
+
+    Parameters:
+    - limit: How many entries to return (1-500)
+    - after: Only return entries with a bigger id, pass the previous next_cursor here
+
+    Send the ETag back in If-None-Match to get an empty 304 when nothing has changed
 
     Example Response:
     '''json
@@ -298,37 +646,44 @@ def view_all_progress(current_user: User = Depends(get_current_user)) -> Dict[st
                 "questions": [],
                 "timestamp": "2025-02-05 10:00:00"
             }
-        ]
+        ],
+        "next_cursor": null
     }
     '''
     """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
         # Get user_id first
-        cursor.execute('SELECT id FROM users WHERE username = ?', (current_user.username,)) 
-        user_id = cursor.fetchone()[0]
-        # The get only this user's entries
-        cursor.execute('SELECT * FROM learning_updates WHERE user_id = ?', (user_id,))
-        rows = cursor.fetchall()
-        entries = []
-        for row in rows:
-            entry = {
-                "id": row[0],
-                "topic":row[1],
-                "hours_spent":row[2],
-                "difficulty_level":row[3],
-                "notes":row[4],
-                "understanding_level":row[5],
-                "questions": json.loads(row[6]) if row[6] else [],
-                "timestamp": row[7]
-            }
-            entries.append(entry)
-
-        return {
-            "total_entries": len(entries),
-            "total_hours": sum(entry["hours_spent"] for entry in entries),
-            "entries": entries
-        }
+        user_id = conn.execute(SQL_SELECT_USER_ID, (current_user.username,)).fetchone()[0]
+
+        # Read before the data, so a write landing in between can only make the body newer than its tag.
+        # The page belongs to one user and depends on limit and after too, so they are all part of the tag,
+        # a client that switches accounts must not get a 304 for the previous user's page
+        version = conn.execute(SQL_SELECT_DATA_VERSION).fetchone()[0]
+        etag = f'"{version}-{user_id}-{limit}-{after}"'
+        headers = {"ETag": etag, "Vary": "Authorization"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        cache_key = ("view-progress", user_id, limit, after)
+        body = get_cached_response(version, cache_key)
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        # Let SQLite count and sum everything and encode this page of entries as a JSON array, all in one statement
+        total_entries, total_hours, page_size, last_id, entries_json = conn.execute(
+            SQL_SELECT_USER_PAGE_JSON, (user_id, after, limit)
+        ).fetchone()
+
+    # Returned as a response directly, jsonable_encoder doesn't know what to do with a Fragment
+    body = orjson.dumps({
+        "total_entries": total_entries,
+        "total_hours": total_hours,
+        "entries": orjson.Fragment(entries_json), # Spliced into the output as SQLite wrote it
+        # A full page means there may be more, the client sends this back as `after`
+        "next_cursor": last_id if page_size == limit else None
+    })
+    cache_response(version, cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
     
 
 
@@ -370,42 +725,99 @@ async def add_learning_progress(
         '''
   
       """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            # First get user's ID
-            cursor.execute('SELECT id FROM users WHERE username = ?', (current_user.username,))
-            user_id = cursor.fetchone()[0]
-            
-            questions_json = json.dumps(update.questions)
-            cursor.execute('''
-                INSERT INTO learning_updates
-                (user_id ,topic, hours_spent, difficulty_level, notes, understanding_level, questions, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                RETURNING id
-            ''', (
-                user_id,
-                update.topic,
-                update.hours_spent,
-                update.difficulty_level,
-                update.notes,
-                update.understanding_level,
-                questions_json,
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            ))
-            new_id = cursor.fetchone()[0]
-            conn.commit()
-            return {
-                "message": "Progress updated successfully!",
-                "data": {**update.model_dump(), "id": new_id}                   
-            }
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
+    def insert(conn):
+        # First get user's ID
+        user_id = conn.execute(SQL_SELECT_USER_ID, (current_user.username,)).fetchone()[0]
+
+        questions_json = _questions_to_db(update.questions)
+        new_id = conn.execute(SQL_INSERT_ENTRY_RETURNING_ID, (
+            user_id,
+            update.topic,
+            update.hours_spent,
+            update.difficulty_level,
+            update.notes,
+            update.understanding_level,
+            questions_json,
+            timestamp
+        )).fetchone()[0]
+        conn.commit()
+        return new_id
+
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    new_id = await run_write(insert)
+    # Build the response from the validated fields we already have, no model_dump round trip
+    return {
+        "message": "Progress updated successfully!",
+        "data": {
+            "topic": update.topic.value,
+            "hours_spent": update.hours_spent,
+            "difficulty_level": update.difficulty_level,
+            "notes": update.notes,
+            "understanding_level": update.understanding_level,
+            "questions": update.questions,
+            "id": new_id,
+            "timestamp": timestamp
+        }
+    }
+
+
+# Every write goes through the one writer thread, so one huge batch would hold up all other writes until it is done
+MAX_BATCH_SIZE = 500
+
+@app.post("/add-progress-batch", tags=["Learning Progress"])
+async def add_learning_progress_batch(
+    updates: List[LearningUpdate] = Body(..., max_length=MAX_BATCH_SIZE),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Record many learning sessions at once (requires authentication)
+
+    All entries are written in a single transaction, so adding N sessions
+    costs one commit instead of N.
+
+    Parameters:
+    - A list of up to 500 learning sessions, each with the same fields as /add-progress
+
+    Returns:
+    - Success message
+    - Number of entries added
+    - IDs of the new entries, in the order they were sent
+    """
+    if not updates:
+        raise HTTPException(status_code=400, detail="No entries to add")
+
+    def insert_all(conn):
+        user_id = conn.execute(SQL_SELECT_USER_ID, (current_user.username,)).fetchone()[0]
+
+        # The whole batch shares one timestamp
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        conn.executemany(SQL_INSERT_ENTRY, [(
+            user_id,
+            update.topic,
+            update.hours_spent,
+            update.difficulty_level,
+            update.notes,
+            update.understanding_level,
+            _questions_to_db(update.questions),
+            timestamp
+        ) for update in updates])
+        # executemany drops RETURNING rows, but the ids are consecutive: the rows go in one transaction,
+        # which holds SQLite's write lock from the first insert to the commit, so no other connection
+        # (another worker included) can take an id in between
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.commit()
+        return list(range(last_id - len(updates) + 1, last_id + 1))
+
+    ids = await run_write(insert_all)
+    return {
+        "message": f"{len(updates)} entries added successfully!",
+        "added": len(updates),
+        "ids": ids
+    }
+
 
 @app.put("/update-progress/{entry_id}", tags=["Learning Progress"])
-def update_learning_progress(
+async def update_learning_progress(
     entry_id: int,
     update: LearningUpdatePatch,
     current_user: User = Depends(get_current_user)
@@ -422,61 +834,40 @@ def update_learning_progress(
     - Success message
     - Update entry data
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            # First check if entry exists
-            cursor.execute(
-                'SELECT * FROM learning_updates WHERE id = ? AND user_id = (SELECT id FROM users WHERE username = ?)',
-                (entry_id, current_user.username))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="Entry not found")
-            
-            # Build entry update query dynamicly based on provided fiels
-            update_dict = update.model_dump(exclude_unset=True)
-            if not update_dict:
-                raise HTTPException(status_code=404, detail="No fields to update")
-            
-            # Handle questions list speacially
-            if 'questions' in update_dict:
-                update_dict['questions'] = json.dumps(update_dict['questions'])
-
-            # Construct SQL querry
-            set_values = [f"{k} = ?" for k in update_dict]
-            query = f'''
-                UPDATE learning_updates
-                SET {', '.join(set_values)}
-                WHERE id = ?
-            '''
-
-            # Execute update
-            cursor.execute(query, list(update_dict.values()) + [entry_id])
-            conn.commit()
+    def apply_update(conn, values):
+        # The UPDATE only matches the user's own entry, and RETURNING hands it back,
+        # so no row means the entry doesn't exist (or isn't theirs)
+        row = conn.execute(SQL_UPDATE_ENTRY, values).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Entry not found")
+        conn.commit()
+        return row
+
+    # Fields the client actually sent, the rest are passed as NULL and keep their value
+    if not update.model_fields_set:
+        raise HTTPException(status_code=404, detail="No fields to update")
+
+    questions_sent = 'questions' in update.model_fields_set
+    values = (
+        update.topic,
+        update.hours_spent,
+        update.difficulty_level,
+        update.notes,
+        update.understanding_level,
+        questions_sent,
+        _questions_to_db(update.questions) if questions_sent else None,
+        entry_id,
+        current_user.username
+    )
 
-            # Return update entry
-            cursor.execute('SELECT * FROM learning_updates WHERE id = ?', (entry_id,))
-            row = cursor.fetchone()
+    row = await run_write(apply_update, values)
+    return {
+        "message": "Progress update successfully!",
+        "data": _row_to_dict(row)
+    }
 
-            return {
-                "message": "Progress update successfully!",
-                "data": {
-                    "id": row[0],
-                    "topic": row[1],
-                    "hours_spent": row[2],
-                    "difficulty_level": row[3],
-                    "notes": row[4],
-                    "understanding_level": row[5],
-                    "questions": json.loads(row[6]) if row[6] else [],
-                    "timestamp": row[7]
-                }
-            }
-                                
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
 @app.delete("/delete-progress/{entry_id}", tags=["Learning Progress"])
-def delete_learning_progress(entry_id: int):
+async def delete_learning_progress(entry_id: int):
     """
     Delete a learning entry.
 
@@ -487,26 +878,18 @@ def delete_learning_progress(entry_id: int):
     - Success message
     - ID of the deleted entry
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            #First check if entry exist
-            cursor.execute('SELECT * FROM learning_updates WHERE id = ?', (entry_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail = "Entry form not found")
-            
-            #Delete the entry
-            cursor.execute('DELETE FROM learning_updates WHERE id = ?', (entry_id,))
-            conn.commit()
-
-            return {
-                "message": f"Entry {entry_id} deleted successfully !",
-                "deleted_id": entry_id
-            }
+    def delete(conn):
+        #Delete the entry, RETURNING tells us whether it existed
+        deleted = conn.execute(SQL_DELETE_BY_ID, (entry_id,)).fetchone()
+        if not deleted:
+            raise HTTPException(status_code=404, detail = "Entry form not found")
+        conn.commit()
 
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+    await run_write(delete)
+    return {
+        "message": f"Entry {entry_id} deleted successfully !",
+        "deleted_id": entry_id
+    }
     
 
 @app.get("/view-progress/by-topic/{topic}", tags=["Learning Progress"])
@@ -524,50 +907,35 @@ def get_progress_by_topic(topic: str):
     - Latest 5 entries with full details
     """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            #Add order by timestamp DESC to get most recent entries first
-            cursor.execute('''
-                SELECT * FROM learning_updates
-                WHERE topic = ?
-                ORDER BY timestamp DESC
-                LIMIT 5
-            ''', (topic,)) # Limit to most recent 5 entries
-            rows = cursor.fetchall()
-
-
-            if not rows:
-                raise HTTPException(status_code=404, detail=f"No entries found for topic: {topic}")
-            
-            entries = []
-            total_hours = 0
-            total_difficulty = 0
-            
-            for row in rows:
-                entry = {
-                    "id": row[0],
-                    "topic": row[1],
-                    "hours_spent": row[2],
-                    "difficulty_level": row[3],
-                    "notes": row[4],
-                    "understanding_level": row[5],
-                    "questions": json.loads(row[6]) if row[6] else [],
-                    "timestamp": row[7]
-                }
-                entries.append(entry)
-                total_hours += row[2]  # hours_spent
-                total_difficulty += row[3]  # difficulty_level
+        # The database's version, so writes from other workers or processes are seen too
+        version = conn.execute(SQL_SELECT_DATA_VERSION).fetchone()[0]
+        cache_key = ("progress-by-topic", topic)
+        body = get_cached_response(version, cache_key)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
 
-            return {
-                "topic": topic,
-                "recent_entries": len(entries),
-                "total_hours": round(total_hours,2),
-                "average_difficulty": round(total_difficulty / len(entries), 2),
-                "latest_entries": entries # Now showing the most recent entries
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=str(e))
+        #Add order by timestamp DESC to get most recent entries first (served by idx_lu_topic_ts)
+        rows = conn.execute(SQL_SELECT_RECENT_BY_TOPIC, (topic,)).fetchall() # Limit to most recent 5 entries
+
+
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"No entries found for topic: {topic}")
+        
+        entries = [_row_to_dict(row) for row in rows]
+        total_hours = sum(entry["hours_spent"] for entry in entries)
+        total_difficulty = sum(entry["difficulty_level"] for entry in entries)
+
+    # Everything here is plain dicts, lists and numbers, so skip jsonable_encoder and let orjson take it as is
+    body = orjson.dumps({
+        "topic": topic,
+        "recent_entries": len(entries),
+        "total_hours": round(total_hours,2),
+        "average_difficulty": round(total_difficulty / len(entries), 2),
+        "latest_entries": entries # Now showing the most recent entries
+    })
+    # Misses (404) aren't cached, they are a single index probe anyway
+    cache_response(version, cache_key, body)
+    return Response(content=body, media_type="application/json")
         
 
 @app.get("/analytics/learning-summary", tags=["Learning Progress"])
@@ -583,135 +951,56 @@ def get_learning_summary():
         - Average understanding level
         - Most studied topic
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # First, let's get a sample row to understand our data structure
-            cursor.execute("SELECT * FROM learning_updates LIMIT 1")
-            sample = cursor.fetchone()
-            print(f"Sample row structure: {sample}")  # This helps us see column order
-            
-            # Now get all entries
-            cursor.execute("""
-                SELECT id, topic, hours_spent, difficulty_level, 
-                       understanding_level, notes, questions, timestamp 
-                FROM learning_updates
-            """)
-            all_data = cursor.fetchall()
-            
-            # Initialize our tracking variables
-            topics = {}
-            total_hours = 0
-            
-            # Process each entry carefully
-            for entry in all_data:
-                # Unpack our data with clear names
-                id, topic, hours, difficulty, understanding, notes, questions, timestamp = entry
-                
-                # Convert numeric values safely
-                try:
-                    hours = float(hours)
-                    understanding = float(understanding)
-                except (ValueError, TypeError):
-                    print(f"Warning: Invalid number format in entry {id}")
-                    continue
-                
-                # Track statistics for this topic
-                if topic not in topics:
-                    topics[topic] = {
-                        "total_hours": 0.0,
-                        "sessions": 0,
-                        "total_understanding": 0.0,
-                        "entries": []
-                    }
-                
-                # Update our counters
-                topics[topic]['total_hours'] += hours
-                topics[topic]['sessions'] += 1
-                topics[topic]['total_understanding'] += understanding
-                topics[topic]['entries'].append({
-                    "date": timestamp,
-                    "hours": hours,
-                    "understanding": understanding
-                })
-                total_hours += hours
-            
-            # Create our statistics summary
-            topic_stats = []
-            for topic, stats in topics.items():
-                avg_understanding = (stats['total_understanding'] / 
-                                  stats['sessions']) if stats['sessions'] > 0 else 0
-                topic_stats.append({
-                    'topic': topic,
-                    'total_hours': round(stats['total_hours'], 2),
-                    'number_of_sessions': stats['sessions'],
-                    'average_understanding': round(avg_understanding, 2)
-                })
-            
-            # Sort topics by total hours spent (most to least)
-            topic_stats.sort(key=lambda x: x['total_hours'], reverse=True)
-            
-            return {
-                'summary': {
-                    'total_entries': len(all_data),
-                    'total_hours': round(total_hours, 2),
-                    'unique_topics': len(topics),
-                    'most_studied_topic': topic_stats[0]['topic'] if topic_stats else None
-                },
-                'topic_statistics': topic_stats
-            }
-            
-    except Exception as e:
-        print(f"Error details: {str(e)}")
-        raise HTTPException(
-            status_code=404,
-            detail=f"Error receiving learning summary: {str(e)}"
-        )
-# This function will set up our database
-def init_db():
+    cache_key = ("learning-summary",)
     with get_db_connection() as conn:
-        cursor = conn.cursor() 
-    #Created a table to store our learning updates
-        cursor.execute('''
-                CREATE TABLE IF NOT EXISTS learning_updates (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    topic   TEXT NOT NULL,
-                    hours_spent REAL NOT NULL,
-                    difficulty_level INTEGER NOT NULL,
-                    notes TEXT NOT NULL,
-                    understanding_level INTEGER NOT NULL,
-                    questions TEXT,
-                    timestamp TEXT NOT NULL,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-        ''')
-    
-        conn.commit()
-    
+        # The database's version, so writes from other workers or processes are seen too
+        version = conn.execute(SQL_SELECT_DATA_VERSION).fetchone()[0]
+        body = get_cached_response(version, cache_key)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+
+        # Let SQLite do the grouping and the totals in one query, Python only sees one row per topic
+        rows = conn.execute(SQL_SUMMARY).fetchall()
+
+        topic_stats = [{
+            'topic': row['topic'],
+            'total_hours': round(row['hours'], 2),
+            'number_of_sessions': row['sessions'],
+            'average_understanding': round(row['avg_understanding'], 2)
+        } for row in rows]
+        # Every row carries the same totals, an empty table has no rows at all
+        total_hours, total_entries = (rows[0]['total_hours'], rows[0]['total_entries']) if rows else (0.0, 0)
+
+    body = orjson.dumps({
+        'summary': {
+            'total_entries': total_entries,
+            'total_hours': round(total_hours, 2),
+            'unique_topics': len(topic_stats),
+            'most_studied_topic': topic_stats[0]['topic'] if topic_stats else None
+        },
+        'topic_statistics': topic_stats
+    })
+    cache_response(version, cache_key, body)
+    return Response(content=body, media_type="application/json")
+
 
 @app.get("/debug/create-test-user")
 def create_test_user():
     """Create test user to fix problem"""
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-
             # Will check if tablets is exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
-            if not cursor.fetchone():
+            if not conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'").fetchone():
                 #Will create table if it doesn't exist
-                init_user_db()
+                init_db()
              # Создаем тестового пользователя
-            hashed_password = pwd_context.hash("testpassword123")
+            hashed_password = HASHED_TEST_PASSWORD
             
             # Проверяем существует ли пользователь
-            cursor.execute("SELECT * FROM users WHERE username = ?", ("testuser",))
-            if cursor.fetchone():
+            if conn.execute("SELECT 1 FROM users WHERE username = ?", ("testuser",)).fetchone():
                 return {"message": "Пользователь testuser уже существует"}
             
-            cursor.execute(
+            conn.execute(
                 "INSERT INTO users (username, email, full_name, hashed_password, disabled) VALUES (?, ?, ?, ?, ?)",
                 ("testuser", "test@example.com", "Test User", hashed_password, False)
             )
@@ -732,13 +1021,10 @@ def check_auth_setup():
     try:
         # Проверяем существование таблицы пользователей
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-            tables = cursor.fetchone()
+            tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'").fetchone()
             
             # Проверяем пользователей в базе
-            cursor.execute("SELECT username, email, hashed_password FROM users")
-            users = cursor.fetchall()
+            users = conn.execute("SELECT username, email, hashed_password FROM users").fetchall()
             
             # Проверяем правильность получения пользователя через функцию
             test_user = get_user("testuser")
@@ -746,7 +1032,7 @@ def check_auth_setup():
             return {
                 "tables_exist": tables is not None,
                 "users_count": len(users),
-                "users": [{"username": user[0], "email": user[1]} for user in users],
+                "users": [{"username": user["username"], "email": user["email"]} for user in users],
                 "get_user_works": test_user is not None,
                 "user_from_function": {
                     "username": test_user.username if test_user else None,
@@ -757,24 +1043,12 @@ def check_auth_setup():
         return {"error": str(e), "type": type(e).__name__}
     
 
-def get_user(username: str) -> Optional[UserInDB]:
-    """Получить пользователя из базы данных"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, username, email, full_name, hashed_password, disabled FROM users WHERE username = ?', (username,))
-            user = cursor.fetchone()
-            
-            if user:
-                return UserInDB(
-                    username=user[1],
-                    email=user[2], 
-                    full_name=user[3],
-                    hashed_password=user[4],
-                    disabled=bool(user[5]) if user[5] is not None else None
-                )
-            return None
-    except Exception as e:
-        print(f"Ошибка при получении пользователя: {str(e)}")
-        return None
-    
+# Run with `python learning_api.py`, or the same settings from the command line:
+# uvicorn learning_api:app --loop uvloop --http httptools --no-access-log
+# Add --workers N to use more cores. The response caches and the ETag follow the database's data_version,
+# so every worker sees every other worker's writes
+if __name__ == "__main__":
+    import uvicorn
+    # "auto" picks uvloop and httptools when they are installed (see requirements.txt)
+    # and access logs are off because writing one line per request costs time on every request
+    uvicorn.run("learning_api:app", host="127.0.0.1", port=8000, loop="auto", http="auto", access_log=False)
@@ -11,7 +11,8 @@ ALGORITHM = "HS256" # The algorithm used to sign in the JWB tokens
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 # How long tokens remains active
 
 # Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# DEV ONLY: 4 rounds keeps this check fast, real code (learning_api.py) keeps the default 12
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4, deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token") # This handles token authentication 
 
 app = FastAPI()
@@ -559,7 +559,7 @@ def get_learning_summary():
                 SUM(hours_spent) as total_hours,    -- row[1]
                 AVG(understanding_level) as avg_understanding       -- row[2]
             FROM learning_updates
-            WHERE timestamp => date('now', '-30 days')
+            WHERE timestamp >= date('now', '-30 days')
         ''')
         recent_status = cursor.fetchone()
 
@@ -1,12 +1,50 @@
 from fastapi.testclient import TestClient
+import learning_api
 from learning_api import app # Importing our main FastAPI app
 import pytest
+import sqlite3
+import time
 
 #Create test client
-client = TestClient(app)
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """A client that runs the app's startup and shutdown against a fresh database file"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(learning_api, "DB_PATH", str(tmp_path_factory.mktemp("db") / "learning_progress.db"))
+        # Drop any connections still open on another database file
+        learning_api.close_pool()
+        learning_api._writer.submit(learning_api._close_writer_connection).result()
+        with TestClient(app) as test_client:
+            yield test_client
+
+def register_and_login(client, username):
+    """Register a user, log in and return the Authorization header for them"""
+    password = "testpassword123"
+    response = client.post("/register", params={"username": username, "password": password})
+    assert response.status_code == 200
+    response = client.post("/token", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="module")
+def auth_headers(client):
+    return register_and_login(client, "testuser")
+
+def make_entry(**changes):
+    """A valid learning entry, with some fields changed"""
+    entry = {
+        "topic": "Python",
+        "hours_spent": 2.0,
+        "difficulty_level": 3,
+        "notes": "Learning FastAPI testing",
+        "understanding_level": 7,
+        "questions": []
+    }
+    entry.update(changes)
+    return entry
 
 #Our first test function
-def test_add_learning_progress():
+def test_add_learning_progress(client, auth_headers):
     """Test adding a new learning progress entry"""
     test_data = {
         "topic": "Python", # using our LearningTopic enum
@@ -17,15 +55,15 @@ def test_add_learning_progress():
         "questions": ["How do we handle test database?"]
     }
 
-    response = client.post("/add-progress", json=test_data) 
+    response = client.post("/add-progress", json=test_data, headers=auth_headers) 
     assert response.status_code == 200 # Check if request was successful
     assert "Progress updated successfully!" in response.json()["message"]
 
 # Test view-progress endpoint
-def test_view_progress():
+def test_view_progress(client, auth_headers):
     """Test the endpoint that shows all learning progress"""
     #first, let's get all progress entries
-    response = client.get("view-progress")
+    response = client.get("view-progress", headers=auth_headers)
     
     #Basic checks
     assert response.status_code == 200 #check if request succeeded
@@ -50,7 +88,7 @@ def test_view_progress():
         assert "hours_spent" in first_entry, "Entry should have hours_spent"
         assert "understanding_level" in first_entry, "Entry should have understanding_level"
 
-def test_update__progress():
+def test_update__progress(client, auth_headers):
     """The updating an existing learning entry"""
     # Frist creat an entry
     initial_data = {
@@ -61,7 +99,7 @@ def test_update__progress():
         "understanding_level": 7,
         "questions": []
     }
-    create_response = client.post("/add-progress", json=initial_data)
+    create_response = client.post("/add-progress", json=initial_data, headers=auth_headers)
     entry_id = create_response.json()["data"]["id"]
 
     # Nos update some fields
@@ -70,7 +108,7 @@ def test_update__progress():
         "notes": "Updated learning session notes"
     }
 
-    response = client.put(f"/update-progress/{entry_id}", json=update_data)
+    response = client.put(f"/update-progress/{entry_id}", json=update_data, headers=auth_headers)
     assert response.status_code == 200
 
     #Check if only specified fields were updates
@@ -79,7 +117,7 @@ def test_update__progress():
     assert updated_data["notes"] == "Updated learning session notes"
     assert updated_data["topic"] == "Python" # Should remain unchange
 
-def test_delete_progress():
+def test_delete_progress(client, auth_headers):
     """Test delete a learning entry"""
     #First create an entry to delete
     initial_data = {
@@ -92,7 +130,7 @@ def test_delete_progress():
 }
     
     # Add the entry and get its ID
-    create_response = client.post('/add-progress', json=initial_data)
+    create_response = client.post('/add-progress', json=initial_data, headers=auth_headers)
     assert create_response.status_code == 200
     entry_id = create_response.json()['data']['id']
 
@@ -102,14 +140,14 @@ def test_delete_progress():
     assert f'Entry {entry_id} deleted successfully !' in delete_response.json()['message']
 
     # Verify entry is gone by trying view it
-    view_all_response = client.get('/view-progress')
+    view_all_response = client.get('/view-progress', headers=auth_headers)
     entries = view_all_response.json()['entries']
     deleted_entry = next((entry for entry in entries if entry['id'] == entry_id), None)
     assert deleted_entry is None, 'Entry shoud not exist after deletion'
 
 
 
-def test_simple_lifecycle():
+def test_simple_lifecycle(client, auth_headers):
     '''Test an entry's complete journey in our system'''
 
     # Step 1 : Create a new entry
@@ -123,11 +161,11 @@ def test_simple_lifecycle():
     }
 
     # Save it and get its ID number
-    response = client.post('/add-progress', json=new_entry)
+    response = client.post('/add-progress', json=new_entry, headers=auth_headers)
     entry_id = response.json()['data']['id']
 
     # Step 2: Check if it's saved correctly
-    check_response = client.get('/view-progress')
+    check_response = client.get('/view-progress', headers=auth_headers)
     assert check_response.status_code == 200
 
     # Step 3: Change something
@@ -135,9 +173,284 @@ def test_simple_lifecycle():
         'hours_spent' : 3.0,
         'notes' : 'Change test note'
     }
-    client.put(f'/update-progress/{entry_id}', json=changes)
+    client.put(f'/update-progress/{entry_id}', json=changes, headers=auth_headers)
 
     # Step 4: Delete it
     delete_response = client.delete(f'/delete-progress/{entry_id}')
-    assert f'Entry {entry_id} deleted successfully !' in delete_response.json()['message'] 
-    
+    assert f'Entry {entry_id} deleted successfully !' in delete_response.json()['message']
+
+def test_add_progress_batch(client):
+    """The batch endpoint returns one id per entry, in the order they were sent"""
+    headers = register_and_login(client, "batchuser")
+    client.post("/add-progress", json=make_entry(), headers=headers)
+
+    batch = [make_entry(topic=topic) for topic in ("Python", "FastAPI", "Database", "Docker")]
+    response = client.post("/add-progress-batch", json=batch, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["added"] == 4
+    # The ids are worked out from the last one, so they have to be the rows that were really inserted
+    entries = client.get("/view-progress", headers=headers).json()["entries"]
+    assert [entry["id"] for entry in entries[1:]] == data["ids"]
+    assert [entry["topic"] for entry in entries[1:]] == [entry["topic"] for entry in batch]
+
+    # An empty batch is refused, and so is one over the size limit
+    assert client.post("/add-progress-batch", json=[], headers=headers).status_code == 400
+    too_many = [make_entry()] * (learning_api.MAX_BATCH_SIZE + 1)
+    assert client.post("/add-progress-batch", json=too_many, headers=headers).status_code == 422
+    assert client.post("/add-progress-batch", json=too_many[1:], headers=headers).status_code == 200
+
+def test_view_progress_pages(client):
+    """Following next_cursor walks every entry exactly once"""
+    headers = register_and_login(client, "pageuser")
+    ids = client.post("/add-progress-batch", json=[make_entry()] * 5, headers=headers).json()["ids"]
+
+    pages = []
+    params = {"limit": 2}
+    while True:
+        page = client.get("/view-progress", params=params, headers=headers).json()
+        # The totals are for all of the user's entries, not just this page
+        assert page["total_entries"] == 5
+        assert page["total_hours"] == 10.0
+        pages.append([entry["id"] for entry in page["entries"]])
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+
+    assert pages == [ids[0:2], ids[2:4], ids[4:]]
+
+    # A cursor past SQLite's 64-bit INTEGER range is a validation error, not a 500
+    response = client.get("/view-progress", params={"after": 2**63}, headers=headers)
+    assert response.status_code == 422
+
+def test_view_progress_not_modified(client):
+    """An unchanged /view-progress answers 304, any write gives a new ETag"""
+    headers = register_and_login(client, "etaguser")
+    client.post("/add-progress", json=make_entry(), headers=headers)
+
+    response = client.get("/view-progress", headers=headers)
+    etag = response.headers["etag"]
+    response = client.get("/view-progress", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # A write through the API
+    client.post("/add-progress", json=make_entry(), headers=headers)
+    response = client.get("/view-progress", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total_entries"] == 2
+    etag = response.headers["etag"]
+
+    # A write from outside the app (another worker, the sqlite3 CLI) must change it too
+    conn = sqlite3.connect(learning_api.DB_PATH)
+    conn.execute("UPDATE learning_updates SET notes = 'Changed outside the API' WHERE id = (SELECT MAX(id) FROM learning_updates)")
+    conn.commit()
+    conn.close()
+    response = client.get("/view-progress", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["entries"][-1]["notes"] == "Changed outside the API"
+    etag = response.headers["etag"]
+
+    # Another user sending that ETag gets their own page, not a 304 for this one
+    other_headers = register_and_login(client, "etagotheruser")
+    response = client.get("/view-progress", headers={**other_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total_entries"] == 0
+    assert response.headers["etag"] != etag
+
+def test_update_keeps_fields_that_were_not_sent(client, auth_headers):
+    """Fields left out of the PUT keep their value, questions included"""
+    entry_id = client.post("/add-progress", json=make_entry(questions=["Why?"]), headers=auth_headers).json()["data"]["id"]
+
+    response = client.put(f"/update-progress/{entry_id}", json={"notes": "Only the notes change"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        **make_entry(questions=["Why?"]),
+        "id": entry_id,
+        "notes": "Only the notes change",
+        "timestamp": response.json()["data"]["timestamp"]
+    }
+
+def test_update_questions(client, auth_headers):
+    """Sent questions replace the old ones, and null clears them"""
+    entry_id = client.post("/add-progress", json=make_entry(questions=["Why?"]), headers=auth_headers).json()["data"]["id"]
+
+    response = client.put(f"/update-progress/{entry_id}", json={"questions": ["How?", "When?"]}, headers=auth_headers)
+    assert response.json()["data"]["questions"] == ["How?", "When?"]
+
+    response = client.put(f"/update-progress/{entry_id}", json={"questions": None}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["questions"] == []
+
+def test_update_null_for_required_field_is_ignored(client, auth_headers):
+    """An explicit null for a required column keeps the stored value instead of failing"""
+    entry_id = client.post("/add-progress", json=make_entry(hours_spent=2.5), headers=auth_headers).json()["data"]["id"]
+
+    response = client.put(f"/update-progress/{entry_id}", json={"hours_spent": None, "notes": None}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["hours_spent"] == 2.5
+    assert response.json()["data"]["notes"] == "Learning FastAPI testing"
+
+def test_update_other_users_entry(client, auth_headers):
+    """A PUT only matches the caller's own entries"""
+    entry_id = client.post("/add-progress", json=make_entry(), headers=auth_headers).json()["data"]["id"]
+    other_headers = register_and_login(client, "otheruser")
+
+    response = client.put(f"/update-progress/{entry_id}", json={"notes": "Not my entry to change"}, headers=other_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Entry not found"
+
+    # No fields at all is refused before touching the database
+    response = client.put(f"/update-progress/{entry_id}", json={}, headers=auth_headers)
+    assert response.status_code == 404
+
+def test_startup_refuses_old_schema(tmp_path, monkeypatch):
+    """A database from before user_id is reported at startup and left untouched"""
+    path = tmp_path / "old_learning_progress.db"
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE learning_updates(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            hours_spent REAL NOT NULL,
+            difficulty_level INTEGER NOT NULL,
+            notes TEXT NOT NULL,
+            understanding_level INTEGER NOT NULL,
+            questions TEXT,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    conn.close()
+
+    monkeypatch.setattr(learning_api, "DB_PATH", str(path))
+    learning_api.close_pool()
+    with pytest.raises(RuntimeError, match="user_id"):
+        with TestClient(app):
+            pass
+    # Don't leave connections to the old file in the pool for the other tests
+    learning_api.close_pool()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {"learning_updates", "sqlite_sequence"}
+    conn.close()
+
+def test_hours_print_the_same_everywhere(client):
+    """hours_spent is stored as sent and comes back rounded the same way from every endpoint"""
+    headers = register_and_login(client, "hoursuser")
+    entry_id = client.post("/add-progress", json=make_entry(topic="Django", hours_spent=1 / 3), headers=headers).json()["data"]["id"]
+
+    from_view = client.get("/view-progress", headers=headers).json()["entries"][0]["hours_spent"]
+    from_update = client.put(f"/update-progress/{entry_id}", json={"notes": "Same hours, new notes"}, headers=headers).json()["data"]["hours_spent"]
+    from_topic = [entry["hours_spent"] for entry in client.get("/view-progress/by-topic/Django").json()["latest_entries"] if entry["id"] == entry_id]
+    assert from_view == from_update == from_topic[0] == 0.333333
+
+    # The stored value keeps its full precision
+    conn = sqlite3.connect(learning_api.DB_PATH)
+    assert conn.execute("SELECT hours_spent FROM learning_updates WHERE id = ?", (entry_id,)).fetchone()[0] == 1 / 3
+    conn.close()
+
+def check_summary(summary):
+    """The totals match the per-topic rows, which come most hours first"""
+    topics = summary["topic_statistics"]
+    assert summary["summary"]["total_entries"] == sum(topic["number_of_sessions"] for topic in topics)
+    assert summary["summary"]["total_hours"] == pytest.approx(sum(topic["total_hours"] for topic in topics), abs=0.01 * len(topics))
+    assert summary["summary"]["unique_topics"] == len(topics)
+    assert [topic["total_hours"] for topic in topics] == sorted((topic["total_hours"] for topic in topics), reverse=True)
+    if topics:
+        assert summary["summary"]["most_studied_topic"] == topics[0]["topic"]
+
+def test_learning_summary_follows_writes(client):
+    """The cached summary is rebuilt after every add, update and delete"""
+    headers = register_and_login(client, "summaryuser")
+    before = client.get("/analytics/learning-summary").json()
+    check_summary(before)
+
+    def ai_row(summary):
+        return next((topic for topic in summary["topic_statistics"] if topic["topic"] == "AI"), {"total_hours": 0, "number_of_sessions": 0})
+
+    ids = client.post("/add-progress-batch", json=[make_entry(topic="AI", hours_spent=23.5)] * 6, headers=headers).json()["ids"]
+    added = client.get("/analytics/learning-summary").json()
+    check_summary(added)
+    assert added["summary"]["total_entries"] == before["summary"]["total_entries"] + 6
+    assert added["summary"]["total_hours"] == pytest.approx(before["summary"]["total_hours"] + 141.0)
+    assert ai_row(added)["number_of_sessions"] == ai_row(before)["number_of_sessions"] + 6
+    assert ai_row(added)["total_hours"] == pytest.approx(ai_row(before)["total_hours"] + 141.0)
+
+    client.put(f"/update-progress/{ids[0]}", json={"hours_spent": 1.5}, headers=headers)
+    updated = client.get("/analytics/learning-summary").json()
+    check_summary(updated)
+    assert updated["summary"]["total_hours"] == pytest.approx(added["summary"]["total_hours"] - 22.0)
+
+    client.delete(f"/delete-progress/{ids[1]}")
+    deleted = client.get("/analytics/learning-summary").json()
+    check_summary(deleted)
+    assert deleted["summary"]["total_entries"] == added["summary"]["total_entries"] - 1
+    assert deleted["summary"]["total_hours"] == pytest.approx(updated["summary"]["total_hours"] - 23.5)
+
+def test_progress_by_topic_follows_writes(client):
+    """The cached by-topic body is rebuilt after every add, update and delete"""
+    headers = register_and_login(client, "topicuser")
+    before = client.get("/view-progress/by-topic/Database")
+    assert before.status_code in (200, 404)
+
+    entry_id = client.post("/add-progress", json=make_entry(topic="Database", hours_spent=4.0), headers=headers).json()["data"]["id"]
+    added = client.get("/view-progress/by-topic/Database").json()
+    assert added["topic"] == "Database"
+    assert entry_id in [entry["id"] for entry in added["latest_entries"]]
+    assert added["total_hours"] == pytest.approx(sum(entry["hours_spent"] for entry in added["latest_entries"]), abs=0.01)
+
+    client.put(f"/update-progress/{entry_id}", json={"hours_spent": 6.0}, headers=headers)
+    updated = client.get("/view-progress/by-topic/Database").json()
+    assert [entry["hours_spent"] for entry in updated["latest_entries"] if entry["id"] == entry_id] == [6.0]
+    assert updated["total_hours"] == pytest.approx(added["total_hours"] + 2.0)
+
+    client.delete(f"/delete-progress/{entry_id}")
+    deleted = client.get("/view-progress/by-topic/Database")
+    if deleted.status_code == 200:
+        assert entry_id not in [entry["id"] for entry in deleted.json()["latest_entries"]]
+    else:
+        assert deleted.status_code == 404
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    """Count the jwt.decode calls get_current_user makes"""
+    calls = []
+    decode = learning_api.jwt.decode
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+    monkeypatch.setattr(learning_api.jwt, "decode", counting_decode)
+    return calls
+
+def test_rejected_token_is_cached(client, decode_calls):
+    """A bad token is decoded once, repeats are rejected from the cache until that entry runs out"""
+    headers = {"Authorization": "Bearer not-a-real-token"}
+    learning_api._token_cache.pop("not-a-real-token", None)
+
+    assert client.get("/view-progress", headers=headers).status_code == 401
+    assert client.get("/view-progress", headers=headers).status_code == 401
+    assert decode_calls == ["not-a-real-token"]
+
+    # Once the entry is out of date the token is checked again, and still refused
+    learning_api._token_cache["not-a-real-token"] = (time.time() - 1, None)
+    assert client.get("/view-progress", headers=headers).status_code == 401
+    assert decode_calls == ["not-a-real-token"] * 2
+
+def test_expired_token_cache_entry_is_decoded_again(client, decode_calls):
+    """A valid token is decoded once, then again after its cache entry runs out"""
+    headers = register_and_login(client, "tokencacheuser")
+    token = headers["Authorization"].split()[1]
+    learning_api._token_cache.pop(token, None)
+
+    assert client.get("/view-progress", headers=headers).status_code == 200
+    assert client.get("/view-progress", headers=headers).status_code == 200
+    assert decode_calls == [token]
+
+    expires, user = learning_api._token_cache[token]
+    assert user.username == "tokencacheuser"
+    learning_api._token_cache[token] = (time.time() - 1, user)
+    assert client.get("/view-progress", headers=headers).status_code == 200
+    assert decode_calls == [token, token]
+    assert learning_api._token_cache[token][0] > time.time()